@@ -4,11 +4,22 @@ Parser for dhcpd.lease file
 Tested with isc-dhcpd-4.2.2
 """
 
+import os
+import re
 import sys
+import stat
+import mmap
+import multiprocessing
+import socket
 from optparse import OptionParser
-import re
 from datetime import datetime, timedelta
 
+# In python 3 intern is moved from builtins to sys module
+try:
+    from sys import intern
+except ImportError:
+    pass
+
 
 class LeaseError(Exception):
     """
@@ -17,20 +28,6 @@ class LeaseError(Exception):
     """
 
 
-def ip_as_int(ip_str):
-    """
-    The function of converting an ip address to an int
-
-    Args:
-        ip_str (str): str object with an ip address
-    """
-
-    tokens = ip_str.split('.')
-
-    return (long(tokens[0]) << 24) + (long(tokens[1]) << 16) + \
-           (long(tokens[2]) << 8) + long(tokens[3])
-
-
 def round_timedelta(tdelta):
     """
     The microsecond rounding function for the timedelta object
@@ -73,391 +70,429 @@ class Lease(object):
     # Regular expresson for an ip address
     REGEX_IP = r"[1-9]\d{0,2}\.\d{1,3}\.\d{1,3}\.\d{1,3}"
 
-    # Regular expression for date and time record in dhcpd.leases file
-    REGEX_TIMESTAMP = r"\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2}"
+    # Regular expression for date and time record in dhcpd.leases file,
+    # each part of date and time is captured by its own group
+    REGEX_TIMESTAMP = r"(\d{4})/(\d{2})/(\d{2})\s+(\d{2}):(\d{2}):(\d{2})"
 
-    def __init__(self, lease_record):
-        """
-        Args:
-            lease_record (str): single lease record from dhcpd.leases file
-        """
+    # Lease record statements with a single value. Each statement is a line of
+    # lease record, which starts with the keyword. For the keyword there is the
+    # name of the field and regular expression for the rest of the line.
+    # Each expression has exactly one named group - the name of the field
+    LEASE_FIELDS = {
+        # Client ip address
+        # lease 172.16.0.1 {
+        'lease': ('ip', re.compile(r"(?P<ip>%s)\s+{" % REGEX_IP)),
 
-        self.lease_record = lease_record
+        # Date and time when lease starts
+        # starts 2 2013/12/10 12:57:04;
+        'starts': ('starts', re.compile(r"[0-6]\s+(?P<starts>%s)" % REGEX_TIMESTAMP)),
 
-        # For each lease record field, a method is defined for its processing
-        lease_structure = {
-            'ip':       self.__find_ip,
-            'starts':   self.__find_starts,
-            'ends':     self.__find_ends,
-            'tstp':     self.__find_tstp,
-            'tsfp':     self.__find_tsfp,
-            'atsfp':    self.__find_atsfp,
-            'cltt':     self.__find_cltt,
-            'hardware': self.__find_hardware,
-            'binding':  self.__find_binding,
-            'next':     self.__find_next,
-            'rewind':   self.__find_rewind,
-            'hostname': self.__find_hostname,
-            'uid':      self.__find_uid,
-            'set':      self.__find_set,
-            'option':   self.__find_option
-        }
-
-        # The dictionary containing a lease record structure
-        self.lease = {}
-
-        # Search for available fields in a lease record
-        for field in lease_structure:
-            self.lease[field] = lease_structure[field]()
+        # Date and time when lease ends, or 'never'
+        # ends 2 2013/12/10 13:07:04;
+        'ends': ('ends', re.compile(r"[0-6]\s+(?P<ends>%s|never);" % REGEX_TIMESTAMP)),
 
-    def __getitem__(self, key):
-        """
-        Getting the value of the lease record field
+        # The tstp statement is specified if the failover protocol is being used,
+        # and indicates what time the peer has been told the lease expires.
+        # tstp 2 2013/12/10 13:07:04;
+        'tstp': ('tstp', re.compile(r"[0-6]\s+(?P<tstp>%s);" % REGEX_TIMESTAMP)),
 
-        Args:
-            key (str): key for lease record field
-        """
+        # The tsfp statement is also specified if the failover protocol is being used,
+        # and indicates the lease expiry time that the peer has acknowledged.
+        # tsfp 2 2013/12/10 13:07:04;
+        'tsfp': ('tsfp', re.compile(r"[0-6]\s+(?P<tsfp>%s);" % REGEX_TIMESTAMP)),
 
-        return self.lease[key] if key in self.lease.keys() else None
+        # The atsfp statement is the actual time sent from the failover partner.
+        # atsfp 2 2013/12/10 13:07:04;
+        'atsfp': ('atsfp', re.compile(r"[0-6]\s+(?P<atsfp>%s);" % REGEX_TIMESTAMP)),
 
-    def __eq__(self, other):
-        """
-        Comparison of two records by ip address
+        # The cltt statement is the client's last transaction time.
+        # cltt 2 2013/12/10 12:57:04;
+        'cltt': ('cltt', re.compile(r"[0-6]\s+(?P<cltt>%s);" % REGEX_TIMESTAMP)),
 
-        Args:
-            other (Lease): another Lease record object
-        """
+        # Ethernet hardware address
+        # hardware ethernet 60:a4:4c:b5:6a:dd;
+        'hardware': ('hardware', re.compile(r"ethernet\s+"
+                                            r"(?P<hardware>([\da-f]{2}:){5}[\da-f]{2});",
+                                            re.IGNORECASE
+                                           )),
+
+        # The binding state statement declares the lease's binding state. When the
+        # DHCP server is not configured to use the failover protocol, a lease's
+        # binding state will be either active or free. The failover protocol adds
+        # some additional transitional states, as well as the backup state, which
+        # indicates that the lease is available for allocation by the failover secondary.
+        # binding state free;
+        'binding': ('binding', re.compile(r"state\s+(?P<binding>\w+);")),
 
-        return True if self['ip'] == other['ip'] else False
+        # The next binding state statement indicates what state the lease will move to when
+        # the current state expires. The time when the current state expires is specified
+        # in the ends statement.
+        # next binding state free;
+        'next': ('next', re.compile(r"binding\s+state\s+(?P<next>\w+);")),
 
-    @property
-    def static(self):
-        """
-        The property that determines whether a lease record is static
-        """
+        # This  statement is part of an optimization for use with failover. This
+        # helps a server rewind a lease to the state most recently transmitted to
+        # its peer.
+        # rewind binding state free;
+        'rewind': ('rewind', re.compile(r"binding\s+state\s+(?P<rewind>\w+);")),
 
-        # Static recording can be without a ends field
-        if self['ends'] is None:
-            return True
+        # Client hostname
+        # client-hostname "arm-1";
+        'client-hostname': ('hostname', re.compile(r'"(?P<hostname>[\w\-]+)";')),
 
-        # If ends field has a string value it has to be 'never'
-        if isinstance(self['ends'], str):
-            if self['ends'] == 'never':
-                return True
-            else:
-                raise LeaseError('Wrong value in ends: ' + self['ends'])
+        # Client uid
+        # uid "\001RT\000\314$\272";
+        'uid': ('uid', re.compile(r'"(?P<uid>.*)";'))
+    }
 
-        # If the field is present and the value is not equal to 'never'
-        # this is not a static record
-        return False
+    # Lease record fields with date and time value
+    TIMESTAMP_FIELDS = ('starts', 'ends', 'tstp', 'tsfp', 'atsfp', 'cltt')
 
-    @property
-    def active(self):
-        """
-        The property that determines whether the lease record is active NOW
-        """
+    # Lease record fields with binding state value
+    STATE_FIELDS = ('binding', 'next', 'rewind')
 
-        now = datetime.utcnow()
+    # Lease record statements with a pair of name and value. All statements with
+    # the keyword are collected to the dictionary of the field by the name.
+    # Each expression has exactly two groups - the name and the value
+    LEASE_DICT_FIELDS = {
+        # Variable = value
+        # set ddns-rev-name = "151.5.0.10.in-addr.arpa.";
+        'set': ('set', re.compile(r'(?P<variable>[\w-]+)\s+=\s+"(?P<value>.+)";')),
 
-        # Static lease always active
-        if self.static:
-            return True
+        # Key value
+        # option agent.circuit-id string;
+        'option': ('option', re.compile(r'(?P<key>.+)\s+"(?P<value>.+)";'))
+    }
 
-        # If lease record isn't static, ends field have to be datetime object
-        return self['starts'] <= now and self['ends'] > now
+    # Names of all lease record fields
+    FIELDS = frozenset([field for field, _ in LEASE_FIELDS.values()] +
+                       [field for field, _ in LEASE_DICT_FIELDS.values()])
 
-    @property
-    def abandoned(self):
-        """
-        The property that determines whether the lease record is abndoned
-        """
+    # Names of all lease record fields in a fixed order, e.g. for passing
+    # values of fields between processes
+    FIELD_NAMES = tuple(sorted(FIELDS))
 
-        return self['binding'] == 'abandoned'
+    # Each lease record field is an attribute of the object, there is no
+    # dictionary for attributes per lease record
+    __slots__ = FIELD_NAMES + ('lease_record', '__static')
 
-    def __find_ip(self):
+    def __init__(self, lease_record, timestamps=None):
         """
-        The method of retrieving an ip address from a lease record
-
-        Returns:
-            str: ip address string
+        Args:
+            lease_record (str): single lease record from dhcpd.leases file
+            timestamps (dict): date and time objects by their records in dhcpd.leases
+                file, it can be shared by lease records of the same file
         """
 
-        # Regular expression for client ip address in lease record
-        # lease 172.16.0.1 {
-        regex_ip = r"lease\s+(?P<ip>{})\s+{{".format(self.REGEX_IP)
+        self.lease_record = lease_record
 
-        match = re.search(regex_ip, self.lease_record)
+        if timestamps is None:
+            timestamps = {}
 
-        return match.group('ip') if match else None
+        # Each lease record field is stored in the attribute with its name
+        for field, _ in self.LEASE_FIELDS.values():
+            setattr(self, field, None)
 
-    def __find_starts(self):
-        """
-        The method of retrieving a starts field from a lease record
+        for field, _ in self.LEASE_DICT_FIELDS.values():
+            setattr(self, field, {})
 
-        Returns:
-            datetime: date and time when lease starts
-        """
+        # Search for available fields in a lease record line by line, the keyword
+        # at the beginning of a line determines the field. The first occurrence
+        # of a single value field is taken
+        for line in self.lease_record.splitlines():
+            statement = line.split(None, 1)
 
-        # Regular expression for starts date and time in lease record
-        # starts 2 2013/12/10 12:57:04;
-        regex_starts = r"starts\s+[0-6]\s+(?P<starts>{})".format(self.REGEX_TIMESTAMP)
+            # Lines with a single word are skipped
+            if len(statement) != 2:
+                continue
 
-        match = re.search(regex_starts, self.lease_record)
+            keyword, value = statement
 
-        return datetime.strptime(match.group('starts'), '%Y/%m/%d %H:%M:%S') if match else None
+            if keyword in self.LEASE_FIELDS:
+                field, regex = self.LEASE_FIELDS[keyword]
 
-    def __find_ends(self):
-        """
-        The method of retrieving a ends field from a lease record
+                if getattr(self, field) is None:
+                    match = regex.match(value)
 
-        Returns:
-            datetime or str: date and time when lease ends, or str 'never'
-        """
+                    if match:
+                        setattr(self, field, self.__parse_value(field, match, timestamps))
 
-        # Regular expression for ends date and time in lease record
-        # ends 2 2013/12/10 13:07:04;
-        regex_ends = r"ends\s+[0-6]\s+(?P<ends>{}|never);".format(self.REGEX_TIMESTAMP)
+            elif keyword in self.LEASE_DICT_FIELDS:
+                field, regex = self.LEASE_DICT_FIELDS[keyword]
 
-        match = re.search(regex_ends, self.lease_record)
+                match = regex.match(value)
 
-        if match:
-            if match.group('ends') == 'never':
-                ends = 'never'
-            else:
-                ends = datetime.strptime(match.group('ends'), '%Y/%m/%d %H:%M:%S')
+                if match:
+                    name, value = match.groups()
+                    getattr(self, field)[name] = value
 
-            return ends
+        # Cached value of static property, it is computed on first access
+        self.__static = None
 
-        # If didn't get ends field
-        return None
+    def __getitem__(self, key):
+        """
+        Getting the value of the lease record field
 
-    def __find_tstp(self):
+        Args:
+            key (str): key for lease record field
         """
-        The method of retrieving a tstp field from a lease record
 
-        The tstp statement is specified if the failover protocol is being used,
-        and indicates what time the peer has been told the lease expires.
+        return getattr(self, key) if key in self.FIELDS else None
 
-        Returns:
-            datetime: date and time in tstp field
+    @property
+    def lease(self):
+        """
+        The dictionary containing a lease record structure
         """
 
-        # Regular expression for tstp date and time in lease record
-        # tstp 2 2013/12/10 13:07:04;
-        regex_tstp = r"tstp\s+[0-6]\s+(?P<tstp>{});".format(self.REGEX_TIMESTAMP)
-
-        match = re.search(regex_tstp, self.lease_record)
+        return dict((field, getattr(self, field)) for field in self.FIELDS)
 
-        return datetime.strptime(match.group('tstp'), '%Y/%m/%d %H:%M:%S') if match else None
+    def __eq__(self, other):
+        """
+        Comparison of two records by ip address
 
-    def __find_tsfp(self):
+        Args:
+            other (Lease): another Lease record object
         """
-        The method of retrieving a tsfp field in lease record
 
-        The tsfp statement is also specified if the failover protocol is being used,
-        and indicates the lease expiry time that the peer has acknowledged.
+        if not isinstance(other, Lease):
+            return NotImplemented
 
-        Returns:
-            datetime: date and time in tsfp field
+        return self['ip'] == other['ip']
+
+    def __ne__(self, other):
         """
+        Comparison of two records by ip address, python 2 doesn't derive it from __eq__
 
-        # Regular expression for tsfp date and time in lease record
-        # tsfp 2 2013/12/10 13:07:04;
-        regex_tsfp = r"tsfp\s+[0-6]\s+(?P<tsfp>{});".format(self.REGEX_TIMESTAMP)
+        Args:
+            other (Lease): another Lease record object
+        """
 
-        match = re.search(regex_tsfp, self.lease_record)
+        equal = self.__eq__(other)
 
-        return datetime.strptime(match.group('tsfp'), '%Y/%m/%d %H:%M:%S') if match else None
+        return equal if equal is NotImplemented else not equal
 
-    def __find_atsfp(self):
+    def __hash__(self):
+        """
+        Hash of a record by ip address, consistent with __eq__
         """
-        The method for retrieving atsfp field in lease record
 
-        The atsfp statement is the actual time sent from the failover partner.
+        return hash(self['ip'])
 
-        Returns:
-            datetime: date and time in atsfp field
+    @property
+    def static(self):
+        """
+        The property that determines whether a lease record is static
         """
 
-        # Regular expression for atsfp date and time in lease record
-        # atsfp 2 2013/12/10 13:07:04;
-        regex_atsfp = r"atsfp\s+[0-6]\s+(?P<atsfp>{});".format(self.REGEX_TIMESTAMP)
-
-        match = re.search(regex_atsfp, self.lease_record)
+        if self.__static is None:
+            self.__static = self.__is_static()
 
-        return datetime.strptime(match.group('atsfp'), '%Y/%m/%d %H:%M:%S') if match else None
+        return self.__static
 
-    def __find_cltt(self):
+    @property
+    def active(self):
+        """
+        The property that determines whether the lease record is active NOW
         """
-        The method for retrieving cltt field in lease record
 
-        The cltt statement is the client's last transaction time.
+        return self.active_at(datetime.utcnow())
 
-        Returns:
-            datetime: date and time in cltt field
+    def active_at(self, now):
         """
+        The method that determines whether the lease record is active at the given time
 
-        # Regular expression for cltt date and time in lease record
-        # cltt 2 2013/12/10 12:57:04;
-        regex_cltt = r"cltt\s+[0-6]\s+(?P<cltt>{});".format(self.REGEX_TIMESTAMP)
+        Args:
+            now (datetime): date and time in UTC
+        """
 
-        match = re.search(regex_cltt, self.lease_record)
+        # Static lease always active
+        if self.static:
+            return True
 
-        return datetime.strptime(match.group('cltt'), '%Y/%m/%d %H:%M:%S') if match else None
+        # If lease record isn't static, ends field have to be datetime object
+        return self['starts'] <= now and self['ends'] > now
 
-    def __find_hardware(self):
+    @property
+    def abandoned(self):
         """
-        The method for retrieving hardware ethernet field in lease record
-
-        Returns:
-            str: ethernet hardware address
+        The property that determines whether the lease record is abndoned
         """
 
-        # Regulr expression for hardware ethernet address in lease record
-        # hardware ethernet 60:a4:4c:b5:6a:dd;
-        regex_hardware = (r"hardware\s+ethernet\s+"
-                          r"(?P<hardware>([\da-f]{2}:){5}[\da-f]{2});"
-                         )
-
-        match = re.search(regex_hardware, self.lease_record, re.IGNORECASE)
-
-        return match.group('hardware') if match else None
+        return self['binding'] == 'abandoned'
 
-    def __find_binding(self):
+    @classmethod
+    def from_field_values(cls, lease_record, values):
         """
-        The method for retrieving binding state in lease record
+        The method of creating a lease record object from already parsed values of
+        its fields, e.g. parsed in another process
 
-        The binding state statement declares the lease's binding state. When the
-        DHCP server is not configured to use the failover protocol, a lease's
-        binding state will be either active or free. The failover protocol adds
-        some additional transitional states, as well as the backup state, which
-        indicates that the lease is available for allocation by the failover secondary.
+        Args:
+            lease_record (str): single lease record from dhcpd.leases file
+            values (tuple): values of lease record fields in order of FIELD_NAMES
 
         Returns:
-            str: binding state
+            Lease: lease record object
         """
 
-        # Regular expression for binding state in lease record
-        # binding state free;
-        regex_binding = r"binding\s+state\s+(?P<binding>\w+);"
+        lease = cls.__new__(cls)
+        lease.lease_record = lease_record
+
+        for field, value in zip(cls.FIELD_NAMES, values):
+            setattr(lease, field, value)
+
+        # Unpickled values aren't interned, binding states and 'never' are
+        # interned again as in __parse_value
+        for field in cls.STATE_FIELDS + ('ends',):
+            value = getattr(lease, field)
+
+            if isinstance(value, str):
+                setattr(lease, field, intern(value))
 
-        match = re.search(regex_binding, self.lease_record)
+        lease.__static = None
 
-        return match.group('binding') if match else None
+        return lease
 
-    def __find_next(self):
+    def field_values(self):
         """
-        The method for retrieving next binding state in lease record
+        The method of getting values of lease record fields
 
-        The next binding state statement indicates what state the lease will move to when
-        the current state expires. The time when the current state expires is specified
-        in the ends statement.
+        Returns:
+            tuple: values of lease record fields in order of FIELD_NAMES
+        """
+
+        return tuple([getattr(self, field) for field in self.FIELD_NAMES])
+
+    def __is_static(self):
+        """
+        The method of checking whether a lease record is static
 
         Returns:
-            str: next binding state
+            bool: True if a lease record is static
         """
 
-        # Regular expression for next binding state in
-        # next binding state free;
-        regex_next = r"next\s+binding\s+state\s+(?P<next>\w+);"
+        # Static recording can be without a ends field
+        if self['ends'] is None:
+            return True
 
-        match = re.search(regex_next, self.lease_record)
+        # If ends field has a string value it has to be 'never'
+        if isinstance(self['ends'], str):
+            if self['ends'] == 'never':
+                return True
+            else:
+                raise LeaseError('Wrong value in ends: ' + self['ends'])
 
-        return match.group('next') if match else None
+        # If the field is present and the value is not equal to 'never'
+        # this is not a static record
+        return False
 
-    def __find_rewind(self):
+    def __parse_value(self, field, match, timestamps):
         """
-        The method for retrieving rewind binding state in lease record
+        The method of converting a matched field value to its python object
 
-        This  statement is part of an optimization for use with failover. This
-        helps a server rewind a lease to the state most recently transmitted to
-        its peer.
+        Args:
+            field (str): name of lease record field
+            match (MatchObject): match of the regular expression for the field value
+            timestamps (dict): date and time objects by their records
 
         Returns:
-            str: rewind binding state
+            datetime or str: value of lease record field
         """
 
-        # Regular expression for rewind binding state in lease record
-        # rewind binding state free;
-        regex_rewind = r"rewind\s+binding\s+state\s+(?P<rewind>\w+);"
+        value = match.group(field)
 
-        match = re.search(regex_rewind, self.lease_record)
+        # Static lease ends field can be 'never'
+        if field in self.TIMESTAMP_FIELDS and value != 'never':
+            # Same date and time is often repeated in lease records (e.g. starts and
+            # cltt), so datetime object is created only once for each record
+            timestamp = timestamps.get(value)
 
-        return match.group('rewind') if match else None
+            if timestamp is None:
+                # Groups of date and time parts follow the group of the field
+                timestamp = datetime(*[int(part) for part in match.groups()[1:7]])
+                timestamps[value] = timestamp
 
-    def __find_hostname(self):
-        """
-        The method for retrieving client hostname in lease record
+            return timestamp
 
-        Returns:
-            str: client hostname
-        """
+        # Binding states and 'never' are values from a small set. They are interned,
+        # so all leases share the same strings and comparing them with constants
+        # is comparing by identity
+        if field in self.STATE_FIELDS or value == 'never':
+            return intern(value)
 
-        # Regular expression for hostname in lease record
-        # client-hostname "arm-1";
-        regex_hostname = r'client-hostname\s+"(?P<hostname>[\w\-]+)";'
+        return value
 
-        match = re.search(regex_hostname, self.lease_record)
 
-        return match.group('hostname') if match else None
+def parse_lease_records(lease_file_content, start, end):
+    """
+    The function of parsing lease records in a part of dhcpd.leases file
 
-    def __find_uid(self):
-        """
-        The method for retrieving uid in lease record
+    Args:
+        lease_file_content (mmap or str): memory mapped or read dhcpd.leases file
+        start (int): offset of the part, it has to be at the beginning of a line
+        end (int): offset of the end of the part
 
-        Returns:
-            str: client uid
-        """
+    Returns:
+        list: Lease objects in order of lease records in the part
+    """
 
-        # Regular expression for uid in lease record
-        # uid "\001RT\000\314$\272";
-        regex_uid = r'uid\s+"(?P<uid>.*)";'
+    # Date and time objects by their records, shared by all leases of the part
+    timestamps = {}
 
-        match = re.search(regex_uid, self.lease_record)
+    return [Lease(match.group(), timestamps) for match in
+            LeaseDatabaseManager.REGEX_LEASE_RECORD.finditer(lease_file_content, start, end)]
 
-        return match.group('uid') if match else None
 
-    def __find_set(self):
-        """
-        The method for retrieving sets statements in lease record
+# Memory mapped or read dhcpd.leases file of the parent process in a worker process
+worker_lease_file_content = None
 
-        Returns:
-            dict: dictionary with set records
-        """
 
-        # Regular expression for variable = value in lease record
-        # set ddns-rev-name = "151.5.0.10.in-addr.arpa.";
-        regex_set = r'set\s+(?P<variable>[\w-]+)\s+=\s+"(?P<value>.+)";'
+def init_lease_file_worker(lease_file_content):
+    """
+    The function of initializing a worker process for parsing dhcpd.leases file.
+    The worker is forked from the parent process and inherits its memory mapped
+    file, so all workers parse exactly the same file content the parent split
+    into parts, even if dhcpd appends to or replaces the file meanwhile
 
-        sets = {}
+    Args:
+        lease_file_content (mmap or str): memory mapped or read dhcpd.leases file
+            of the parent process
+    """
 
-        for match in re.finditer(regex_set, self.lease_record):
-            variable = match.group('variable')
-            value = match.group('value')
-            sets[variable] = value
+    global worker_lease_file_content
 
-        return sets
+    worker_lease_file_content = lease_file_content
 
-    def __find_option(self):
-        """
-        The method for retrieving option statements in lease record
 
-        Returns:
-            dict: dictionary with option records
-        """
+def parse_lease_file_part(part):
+    """
+    The function of parsing lease records in a part of dhcpd.leases file in a worker
+    process initialized by init_lease_file_worker. Lease objects aren't sent back to
+    the parent process, which has the same file content. Only offsets of lease
+    records and values of their fields are sent, so there is less to pickle
 
-        # Regular expression for key value in lease record
-        # option agent.circuit-id string;
-        regex_option = r'option\s+(?P<key>.+)\s+"(?P<value>.+)";'
+    Args:
+        part (tuple): start and end offsets of the part
+
+    Returns:
+        list: tuples with start and end offsets of a lease record and values of
+            its fields, in order of lease records in the part
+    """
+
+    start, end = part
 
-        options = {}
+    # Date and time objects by their records, shared by all leases of the part
+    timestamps = {}
 
-        for match in re.finditer(regex_option, self.lease_record):
-            key = match.group('key')
-            value = match.group('value')
-            options[key] = value
+    records = []
+
+    for match in LeaseDatabaseManager.REGEX_LEASE_RECORD.finditer(worker_lease_file_content,
+                                                                   start, end):
+        lease = Lease(match.group(), timestamps)
+        records.append((match.start(), match.end(), lease.field_values()))
+
+    return records
 
-        return options
 
 class LeaseDatabaseManager(object):
     """
@@ -465,13 +500,32 @@ class LeaseDatabaseManager(object):
     dhcpd.leases file and place in memory database with Lease objects
     """
 
-    # Regular expression for one lease record
-    REGEX_LEASE_RECORD = re.compile(r"lease .*{[^}]+?\n}")
-
-    def __init__(self, lease_file_path):
+    # Regular expression for one lease record, it is matched against the
+    # bytes of memory mapped dhcpd.leases file. A record starts at the beginning
+    # of a line, its lines can't contain '}' and can't start the next record,
+    # so an unterminated record is never scanned past the next one. The rest of
+    # the header line (e.g. '\r' or spaces) is allowed, and a record has to have
+    # at least one line between the braces, so an empty record is skipped
+    REGEX_LEASE_RECORD = re.compile(br"^lease [^\n{]*\{[^}\n]*(?:\n(?!lease )[^}\n]*)+\n\}",
+                                    re.MULTILINE)
+
+    # Lines of active leases report
+    ACTIVE_REPORT_BORDER = '+------------------------------------------------------------------------------'
+    ACTIVE_REPORT_SEPARATOR = '+-----------------+-------------------+----------------------+-----------------'
+    ACTIVE_REPORT_HEADER = '| IP Address      | MAC Address       | Expires (days,H:M:S) | Client Hostname '
+    ACTIVE_REPORT_ROW = '| {:<15} | {:<17} | {:>20} | {}'
+
+    # Lines of abandoned leases report
+    ABANDONED_REPORT_BORDER = '+----------------------------------------------------------'
+    ABANDONED_REPORT_SEPARATOR = '+-----------------+----------------------+-----------------'
+    ABANDONED_REPORT_HEADER = '| IP Address      | Starts               | Client Hostname '
+    ABANDONED_REPORT_ROW = '| {:<15} | {:<20} | {}'
+
+    def __init__(self, lease_file_path, processes=1):
         """
         Args:
             lease_file_path (str): path to dhcpd.leases file
+            processes (int): number of processes for parsing dhcpd.leases file
         """
 
         self.leases = []
@@ -479,42 +533,112 @@ class LeaseDatabaseManager(object):
         self.abandoned_leases = []
 
         try:
-            lease_file = open(lease_file_path, "r")
+            lease_file = open(lease_file_path, "rb")
         except IOError:
             print("Can't open " + lease_file_path)
             sys.exit(1)
         else:
             with lease_file:
-                lease_file_content = lease_file.read()
+                lease_file_stat = os.fstat(lease_file.fileno())
 
-        for match in self.REGEX_LEASE_RECORD.finditer(lease_file_content):
-            lease = Lease(match.group())
-            self.leases.append(lease)
+                # Only non-empty regular file can be mapped to memory. Pipes and other
+                # special files (e.g. /dev/stdin) report zero size, they are read
+                if stat.S_ISREG(lease_file_stat.st_mode) and lease_file_stat.st_size > 0:
+                    # The file is mapped to memory instead of reading it to one big string,
+                    # the mapping remains valid after the file is closed
+                    lease_file_content = mmap.mmap(lease_file.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    lease_file_content = lease_file.read()
 
-    def find_active_leases(self):
-        """
-        The method for finding active Lease objects in self.leases and put them to
-        self.active_leases
+        try:
+            parts = self.__split_lease_file(lease_file_content, processes)
+
+            # With a single part the file is parsed in this process
+            if len(parts) == 1:
+                self.leases = parse_lease_records(lease_file_content, *parts[0])
+                return
+
+            # Each part of the file is parsed in its own process. Workers are forked
+            # while the file is still mapped, so they parse the same mapping the parts
+            # were computed on. Results are in order of parts, so leases keep
+            # the order of lease records in the file
+            pool = multiprocessing.Pool(len(parts), init_lease_file_worker, (lease_file_content,))
+
+            try:
+                results = pool.map(parse_lease_file_part, parts)
+            finally:
+                pool.close()
+                pool.join()
+
+            # Lease records are taken from the file content of this process
+            for records in results:
+                for record_start, record_end, values in records:
+                    lease_record = lease_file_content[record_start:record_end]
+                    self.leases.append(Lease.from_field_values(lease_record, values))
+        finally:
+            if isinstance(lease_file_content, mmap.mmap):
+                lease_file_content.close()
+
+    def __split_lease_file(self, lease_file_content, parts_num):
+        """
+        The method of splitting dhcpd.leases file to parts of about the same size.
+        Each part except the first one starts at the beginning of a lease record,
+        so a lease record is never cut in half
+
+        Args:
+            lease_file_content (mmap or str): memory mapped or read dhcpd.leases file
+            parts_num (int): desired number of parts
+
+        Returns:
+            list: tuples with start and end offsets of the parts
         """
 
-        for lease in self.leases:
-            if lease.active:
+        size = len(lease_file_content)
+        offsets = [0]
 
-                # If lease already is in self.active_leases - replace it
-                # dhcpd.leases(5) - The lease file is a log-structured file -whenever
-                # a lease changes, the contents of that lease are written to the end
-                # of the file. This means that it is entirely possible and quite
-                # reasonable for there to be two or more declarations  of the same
-                # lease in the lease file at the same time. In that case, the instance
-                # of that particular lease that appears last in the file  is the one
-                # that is in effect.
-                if lease in self.active_leases:
-                    self.active_leases.remove(lease)
+        for part in range(1, parts_num):
+            # The part starts with the first lease record after its estimated offset
+            offset = lease_file_content.find(b"\nlease ", max(size * part // parts_num, offsets[-1]))
 
-                self.active_leases.append(lease)
+            # There are no more lease records for the rest of parts
+            if offset == -1:
+                break
 
-        # sort self.active_leases by ip address
-        self.active_leases.sort(key=lambda l: ip_as_int(l['ip']))
+            offsets.append(offset + 1)
+
+        offsets.append(size)
+
+        return list(zip(offsets[:-1], offsets[1:]))
+
+    def find_active_leases(self, now=None):
+        """
+        The method for finding active Lease objects in self.leases and put them to
+        self.active_leases
+
+        Args:
+            now (datetime): date and time in UTC to check leases against, current
+                time by default
+        """
+
+        # All leases are checked against the same time in UTC
+        if now is None:
+            now = datetime.utcnow()
+
+        # Active leases by ip address
+        # If lease already is in active_leases - replace it
+        # dhcpd.leases(5) - The lease file is a log-structured file -whenever
+        # a lease changes, the contents of that lease are written to the end
+        # of the file. This means that it is entirely possible and quite
+        # reasonable for there to be two or more declarations  of the same
+        # lease in the lease file at the same time. In that case, the instance
+        # of that particular lease that appears last in the file  is the one
+        # that is in effect.
+        active_leases = {lease['ip']: lease for lease in self.leases if lease.active_at(now)}
+
+        # sort self.active_leases by ip address, packed ip addresses in network
+        # byte order are compared as bytes in the same order as ip addresses
+        self.active_leases = sorted(active_leases.values(),
+                                    key=lambda l: socket.inet_aton(l['ip']))
 
     def find_abandoned_leases(self):
         """
@@ -522,35 +646,23 @@ class LeaseDatabaseManager(object):
         self.abandoned_leases
         """
 
-        for lease in self.leases:
-            if lease.abandoned:
-                self.abandoned_leases.append(lease)
-
-        # sort self.abandoned_leases by ip address
-        self.abandoned_leases.sort(key=lambda l: ip_as_int(l['ip']))
+        # sort self.abandoned_leases by ip address, packed ip addresses in network
+        # byte order are compared as bytes in the same order as ip addresses
+        self.abandoned_leases = sorted((lease for lease in self.leases if lease.abandoned),
+                                       key=lambda l: socket.inet_aton(l['ip']))
 
     def print_active_leases(self, only_static=False):
         """
         The method for printing active leases to stdout
         """
 
-        # Find all active leases in lease database
-        self.find_active_leases()
-
-        # Get current time in UTC
+        # Get current time in UTC, the same time is used for the whole report
         now = datetime.utcnow()
 
-        print('+------------------------------------------------------------------------------')
-
-        # If we want to print only static leases
-        if only_static:
-            print('| DHCPD STATIC LEASES REPORT')
-        else:
-            print('| DHCPD ACTIVE LEASES REPORT')
+        # Find all active leases in lease database
+        self.find_active_leases(now)
 
-        print('+-----------------+-------------------+----------------------+-----------------')
-        print('| IP Address      | MAC Address       | Expires (days,H:M:S) | Client Hostname ')
-        print('+-----------------+-------------------+----------------------+-----------------')
+        rows = []
 
         for lease in self.active_leases:
 
@@ -567,25 +679,31 @@ class LeaseDatabaseManager(object):
             # Some leases can be without hostname
             hostname = lease['hostname'] if lease['hostname'] else ''
 
-            print('| ' + format(lease['ip'], '<15') + ' | ' + \
-                   format(hardware, '<17') + ' | ' + \
-                   format(str(ends), '>20') + ' | ' + \
-                   hostname
-                 )
-
-        print('+-----------------+-------------------+----------------------+-----------------')
+            rows.append(self.ACTIVE_REPORT_ROW.format(lease['ip'], hardware, str(ends), hostname))
 
         # If we want to print only static leases
         if only_static:
-            static_leases_num = len([l for l in self.active_leases if l.static])
-            print('| Total Static Leases: ' + str(static_leases_num))
+            title = '| DHCPD STATIC LEASES REPORT'
+            total = '| Total Static Leases: ' + str(len(rows))
         else:
-            active_leases_num = len(self.active_leases)
-            print('| Total Active Leases: ' + str(active_leases_num))
-
-
-        print('| Report generated (UTC): ' + str(round_datetime(now)))
-        print('+------------------------------------------------------------------------------')
+            title = '| DHCPD ACTIVE LEASES REPORT'
+            total = '| Total Active Leases: ' + str(len(rows))
+
+        # The whole report is written to stdout at once
+        report = [self.ACTIVE_REPORT_BORDER,
+                  title,
+                  self.ACTIVE_REPORT_SEPARATOR,
+                  self.ACTIVE_REPORT_HEADER,
+                  self.ACTIVE_REPORT_SEPARATOR
+                 ]
+        report.extend(rows)
+        report.extend([self.ACTIVE_REPORT_SEPARATOR,
+                       total,
+                       '| Report generated (UTC): ' + str(round_datetime(now)),
+                       self.ACTIVE_REPORT_BORDER
+                      ])
+
+        sys.stdout.write('\n'.join(report) + '\n')
 
     def print_abandoned_leases(self):
         """
@@ -598,25 +716,27 @@ class LeaseDatabaseManager(object):
         # Get current time in UTC
         now = datetime.utcnow()
 
-        print('+----------------------------------------------------------')
-        print('| DHCPD ABANDONED LEASES REPORT')
-        print('+-----------------+----------------------+-----------------')
-        print('| IP Address      | Starts               | Client Hostname ')
-        print('+-----------------+----------------------+-----------------')
+        report = [self.ABANDONED_REPORT_BORDER,
+                  '| DHCPD ABANDONED LEASES REPORT',
+                  self.ABANDONED_REPORT_SEPARATOR,
+                  self.ABANDONED_REPORT_HEADER,
+                  self.ABANDONED_REPORT_SEPARATOR
+                 ]
 
         for lease in self.abandoned_leases:
             # Some leases can be without hostname
             hostname = lease['hostname'] if lease['hostname'] else ''
 
-            print('| ' + format(lease['ip'], '<15') + ' | ' + \
-                   format(str(lease['starts']), '<20') + ' | ' + \
-                   hostname
-                 )
+            report.append(self.ABANDONED_REPORT_ROW.format(lease['ip'], str(lease['starts']), hostname))
 
-        print('+-----------------+----------------------+-----------------')
-        print('| Total Abandoned Leases: ' + str(len(self.abandoned_leases)))
-        print('| Report generated (UTC): ' + str(round_datetime(now)))
-        print('+----------------------------------------------------------')
+        report.extend([self.ABANDONED_REPORT_SEPARATOR,
+                       '| Total Abandoned Leases: ' + str(len(self.abandoned_leases)),
+                       '| Report generated (UTC): ' + str(round_datetime(now)),
+                       self.ABANDONED_REPORT_BORDER
+                      ])
+
+        # The whole report is written to stdout at once
+        sys.stdout.write('\n'.join(report) + '\n')
 
 
 def main():
@@ -625,7 +745,7 @@ def main():
     """
     parser = OptionParser(description="Python script to parse ISC DHCP lease file",
                           prog=sys.argv[0],
-                          usage="%prog [-a | --abandoned] [-s | --static] [filename]"
+                          usage="%prog [-a | --abandoned] [-s | --static] [-j N | --jobs=N] [filename]"
                          )
 
     parser.add_option('-a', '--abandoned',
@@ -640,6 +760,15 @@ def main():
                       default=False
                      )
 
+    parser.add_option('-j', '--jobs',
+                      help="Number of processes for parsing lease file. Parsed leases are "
+                           "sent back from the processes with pickle, which costs about as "
+                           "much as parsing itself, so it pays off only for very large "
+                           "files on several CPU cores",
+                      type="int",
+                      default=1
+                     )
+
     options, arguments = parser.parse_args()
 
     # Same lease can't be static and abandoned
@@ -647,13 +776,17 @@ def main():
         print "Error!!! Found both -a and -s options. Same lease can't be static and abandoned!"
         sys.exit(1)
 
+    if options.jobs < 1:
+        print "Error!!! Number of processes for parsing lease file has to be positive!"
+        sys.exit(1)
+
     if len(arguments) == 1:
         leases_file = arguments[0]
     else:
         leases_file = "/var/lib/dhcp/dhcpd.leases"
 
     # Parse dhcpd.lease file
-    leaseman = LeaseDatabaseManager(leases_file)
+    leaseman = LeaseDatabaseManager(leases_file, processes=options.jobs)
 
     if options.abandoned:
         # Print abandoned leases
@@ -0,0 +1,245 @@
+#!/usr/bin/python
+"""
+Checks for isc_dhcp_leases.py
+
+Run with: python -m unittest test_isc_dhcp_leases
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from isc_dhcp_leases import LeaseDatabaseManager
+
+
+class LeaseRecordRegexTest(unittest.TestCase):
+    """
+    Checks of the regular expression for one lease record
+    """
+
+    # Complete lease record
+    LEASE_RECORD = (b"lease 10.0.5.152 {\n"
+                    b"  starts 2 2013/12/10 12:57:04;\n"
+                    b"  ends 2 2013/12/10 13:07:04;\n"
+                    b"  binding state active;\n"
+                    b"}\n"
+                   )
+
+    # Lease record without closing brace
+    TRUNCATED_RECORD = (b"lease 10.0.5.153 {\n"
+                        b"  starts 2 2013/12/10 12:57:04;\n"
+                        b"  binding state active;\n"
+                       )
+
+    def find_records(self, lease_file_content):
+        """
+        Finding lease records in the content of dhcpd.leases file
+        """
+
+        return [match.group() for match in
+                LeaseDatabaseManager.REGEX_LEASE_RECORD.finditer(lease_file_content)]
+
+    def test_complete_records_around_truncated(self):
+        """
+        Complete records before and after a truncated record are found
+        """
+
+        records = self.find_records(self.LEASE_RECORD + self.TRUNCATED_RECORD + self.LEASE_RECORD)
+
+        self.assertEqual(records, [self.LEASE_RECORD.rstrip(b"\n")] * 2)
+
+    def test_crlf_record(self):
+        """
+        Lease record with CRLF line endings is found
+        """
+
+        record = self.LEASE_RECORD.replace(b"\n", b"\r\n")
+
+        self.assertEqual(self.find_records(record), [record.rstrip(b"\r\n")])
+
+    def test_header_with_trailing_spaces(self):
+        """
+        Lease record with spaces after the opening brace is found
+        """
+
+        record = self.LEASE_RECORD.replace(b"{\n", b"{ \n")
+
+        self.assertEqual(self.find_records(record), [record.rstrip(b"\n")])
+
+    def test_empty_record_skipped(self):
+        """
+        Lease record without any lines between the braces is skipped
+        """
+
+        records = self.find_records(b"lease 10.0.5.154 {\n}\n" + self.LEASE_RECORD)
+
+        self.assertEqual(records, [self.LEASE_RECORD.rstrip(b"\n")])
+
+    def test_many_truncated_records_in_linear_time(self):
+        """
+        Many truncated records are scanned without quadratic backtracking. With
+        quadratic backtracking 8000 records take seconds
+        """
+
+        lease_file_content = self.TRUNCATED_RECORD * 32000 + self.LEASE_RECORD
+
+        start = time.time()
+        records = self.find_records(lease_file_content)
+        elapsed = time.time() - start
+
+        self.assertEqual(len(records), 1)
+        self.assertLess(elapsed, 1.0)
+
+
+class LeaseFileTest(unittest.TestCase):
+    """
+    Checks of reading dhcpd.leases file
+    """
+
+    # Two complete lease records
+    LEASE_RECORDS = (b"lease 10.0.5.152 {\n"
+                     b"  starts 2 2013/12/10 12:57:04;\n"
+                     b"  ends 2 2013/12/10 13:07:04;\n"
+                     b"  binding state free;\n"
+                     b"}\n"
+                     b"lease 10.0.5.153 {\n"
+                     b"  starts 2 2013/12/10 12:57:04;\n"
+                     b"  binding state abandoned;\n"
+                     b"}\n"
+                    )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_regular_file(self):
+        """
+        Lease records are found in a regular file
+        """
+
+        lease_file_path = os.path.join(self.directory, 'dhcpd.leases')
+
+        with open(lease_file_path, 'wb') as lease_file:
+            lease_file.write(self.LEASE_RECORDS)
+
+        leases = LeaseDatabaseManager(lease_file_path).leases
+
+        self.assertEqual([lease['ip'] for lease in leases], ['10.0.5.152', '10.0.5.153'])
+
+    def test_fifo(self):
+        """
+        Lease records are found in a file which isn't regular and reports zero size
+        """
+
+        lease_file_path = os.path.join(self.directory, 'dhcpd.leases')
+        os.mkfifo(lease_file_path)
+
+        def write_lease_records():
+            with open(lease_file_path, 'wb') as lease_file:
+                lease_file.write(self.LEASE_RECORDS)
+
+        writer = threading.Thread(target=write_lease_records)
+        writer.start()
+
+        try:
+            leases = LeaseDatabaseManager(lease_file_path).leases
+        finally:
+            writer.join()
+
+        self.assertEqual([lease['ip'] for lease in leases], ['10.0.5.152', '10.0.5.153'])
+
+
+class ParallelParsingTest(unittest.TestCase):
+    """
+    Checks that parsing dhcpd.leases file in several processes gives the same
+    leases as parsing it in one process
+    """
+
+    # Template of a lease record, the last part of ip address is substituted
+    LEASE_RECORD = ("lease 10.0.5.{0} {{\n"
+                    "  starts 2 2013/12/10 12:57:04;\n"
+                    "  ends 2 2013/12/10 13:07:{1:02d};\n"
+                    "  binding state {2};\n"
+                    "  hardware ethernet 8c:dc:d4:7b:92:{1:02d};\n"
+                    "  set ddns-txt = \"31ebd3a\";\n"
+                    "  client-hostname \"host-{0}\";\n"
+                    "}}\n"
+                   )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_lease_file(self, records_num):
+        """
+        Writing dhcpd.leases file with the given number of lease records
+        """
+
+        lease_file_path = os.path.join(self.directory, 'dhcpd.leases')
+
+        with open(lease_file_path, 'wb') as lease_file:
+            lease_file.write(b"# The format of this file is documented in the dhcpd.leases(5) manual page.\n")
+
+            for record in range(records_num):
+                state = ('active', 'free', 'abandoned')[record % 3]
+                lease_file.write(self.LEASE_RECORD.format(record % 7 + 1, record % 60, state)
+                                 .encode('ascii'))
+
+        return lease_file_path
+
+    def assert_same_leases(self, lease_file_path):
+        """
+        Checking that leases parsed in one and in several processes are the same
+        """
+
+        expected = [(lease.lease, lease.lease_record)
+                    for lease in LeaseDatabaseManager(lease_file_path).leases]
+
+        for processes in (2, 3, 7, 50):
+            leases = LeaseDatabaseManager(lease_file_path, processes=processes).leases
+
+            self.assertEqual([(lease.lease, lease.lease_record) for lease in leases], expected)
+
+        return expected
+
+    def test_many_records(self):
+        """
+        File with many lease records, more than processes
+        """
+
+        self.assertEqual(len(self.assert_same_leases(self.write_lease_file(100))), 100)
+
+    def test_single_record(self):
+        """
+        File with a single lease record, fewer than processes
+        """
+
+        self.assertEqual(len(self.assert_same_leases(self.write_lease_file(1))), 1)
+
+    def test_no_records(self):
+        """
+        File without lease records
+        """
+
+        self.assertEqual(self.assert_same_leases(self.write_lease_file(0)), [])
+
+    def test_empty_file(self):
+        """
+        Empty file
+        """
+
+        lease_file_path = os.path.join(self.directory, 'dhcpd.leases')
+        open(lease_file_path, 'wb').close()
+
+        self.assertEqual(self.assert_same_leases(lease_file_path), [])
+
+
+if __name__ == '__main__':
+    unittest.main()